@@ -18,6 +18,7 @@ export interface Env {
 }
 
 interface ArtifactDataset {
+  pages?: Record<string, { title: string; content: string }>;
   artifacts: Artifact[];
 }
 
@@ -28,7 +29,7 @@ interface Artifact {
   tags: string[];
   pdfTopic?: string;
   infoText?: string;
-  linkedPdf?: { page: number; title: string; content: string }[];
+  linkedPdf?: { page: number }[];
 }
 
 interface ArtifactCatalogItem {
@@ -73,7 +74,10 @@ export interface ChatMessage {
 }
 
 const ARTIFACT_DATASET = dataset as unknown as ArtifactDataset;
-const ARTIFACT_CATALOG: ArtifactCatalogItem[] = buildArtifactCatalog(ARTIFACT_DATASET.artifacts || []);
+const ARTIFACT_CATALOG: ArtifactCatalogItem[] = buildArtifactCatalog(
+  ARTIFACT_DATASET.artifacts || [],
+  ARTIFACT_DATASET.pages || {}
+);
 
 export function json(data: unknown, init?: ResponseInit): Response {
   return new Response(JSON.stringify(data), {
@@ -706,7 +710,10 @@ function buildAmbiguityHint(question: string, candidates: CandidateRef[]): strin
   return `候选歧义提示（仅供判别）：\n${lines.join("\n")}\n若用户问“是哪一块”，请先给候选并解释差异，再给你的首选。`;
 }
 
-function buildArtifactCatalog(artifacts: Artifact[]): ArtifactCatalogItem[] {
+function buildArtifactCatalog(
+  artifacts: Artifact[],
+  pages: Record<string, { title: string; content: string }>
+): ArtifactCatalogItem[] {
   return (artifacts || [])
     .map((item) => {
       const id = safeString(item?.id);
@@ -719,7 +726,7 @@ function buildArtifactCatalog(artifacts: Artifact[]): ArtifactCatalogItem[] {
       const infoText = toPlainText(safeString(item?.infoText));
       const linkedPdf = Array.isArray(item?.linkedPdf) ? (item.linkedPdf as unknown[]) : [];
       const linkedText = linkedPdf
-        .map((page) => toPlainText(safeString((page as { content?: unknown })?.content)))
+        .map((page) => toPlainText(safeString(pages[String((page as { page?: unknown })?.page)]?.content)))
         .filter(Boolean)
         .join(" ");
       const summary = clipText([infoText, linkedText].filter(Boolean).join(" ").trim(), 220);
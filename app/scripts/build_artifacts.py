@@ -3,15 +3,22 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import re
-import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
 from urllib.parse import quote
 
-from PIL import Image
+from PIL import Image, features
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 ROOT = Path(__file__).resolve().parents[2]
 APP_ROOT = ROOT / "app"
@@ -26,12 +33,30 @@ INFO_TEXT_DIR = INFO_IMAGE_DIR / "提取文字"
 PAGE_TEXT_DIR = BOOK / "章节（一）武氏祠汉画-逐页介绍"
 INDEX_MD = MATERIALS / "PDF与展品信息双向索引.md"
 OUTPUT = APP_ROOT / "src" / "data" / "artifacts.json"
+MANIFEST = APP_ROOT / "src" / "data" / ".artifact-manifest.json"
 MODEL_CACHE_DIR = APP_ROOT / "public" / "generated" / "models"
 INFO_CACHE_DIR = APP_ROOT / "public" / "generated" / "info"
 MAX_INLINE_PDF_SIZE = 25 * 1024 * 1024
-
-ROW_RE = re.compile(r"^\|\s*\*\*(.+?)\*\*\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|")
+FINGERPRINT_BYTES = 64 * 1024
+TEXT_READ_WORKERS = 16
+
+# Section heading, series heading or table row; [^\S\n] keeps a row from spanning lines.
+INDEX_LINE_RE = re.compile(
+    r"^(?:## (?P<section>[一二])、"
+    r"|### (?P<series>.*)$"
+    r"|\|[^\S\n]*\*\*(?P<file>.+?)\*\*[^\S\n]*\|[^\S\n]*(?P<pages>.+?)[^\S\n]*\|[^\S\n]*(?P<topic>.+?)[^\S\n]*\|)",
+    re.MULTILINE
+)
+PAGE_TOKEN_RE = re.compile(r"\d+\s*-\s*\d+|\d+")
+PAGE_RANGE_SPLIT_RE = re.compile(r"\s*-\s*")
+PAGE_NO_RE = re.compile(r"第(\d+)页")
+TITLE_RE = re.compile(r"^###\s+(.+)$", re.MULTILINE)
+TAG_BRACKET_RE = re.compile(r"【([^】]+)】")
+TAG_SPLIT_RE = re.compile(r"[、，/\s]+")
 RESAMPLING = Image.Resampling.LANCZOS if hasattr(Image, "Resampling") else Image.LANCZOS
+# Pillow-SIMD publishes ".postN" versions; its encoder makes method=6 not worth the extra time.
+PILLOW_SIMD = ".post" in Image.__version__
+WEBP_METHOD = 4 if PILLOW_SIMD else 6
 
 
 def encode_url_path(*parts: str) -> str:
@@ -39,14 +64,35 @@ def encode_url_path(*parts: str) -> str:
     return "/" + "/".join(clean)
 
 
+def stems(dir_path: Path, ext: str) -> Set[str]:
+    if not dir_path.is_dir():
+        return set()
+    with os.scandir(dir_path) as entries:
+        return {
+            entry.name[: -len(ext)]
+            for entry in entries
+            if entry.name.endswith(ext) and entry.is_file()
+        }
+
+
+def read_text_fast(path: Path) -> str:
+    # One raw read and one decode, skipping TextIOWrapper's incremental decoding.
+    with open(path, "rb") as handle:
+        text = handle.read().decode("utf-8")
+    # Keep read_text()'s universal-newline behaviour for files saved with CRLF.
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
 def parse_pages(raw: str) -> List[int]:
     if "无直接对应" in raw:
         return []
 
     values: List[int] = []
-    for token in re.findall(r"\d+\s*-\s*\d+|\d+", raw):
+    for token in PAGE_TOKEN_RE.findall(raw):
         if "-" in token:
-            start_str, end_str = re.split(r"\s*-\s*", token)
+            start_str, end_str = PAGE_RANGE_SPLIT_RE.split(token)
             start, end = int(start_str), int(end_str)
             if start <= end:
                 values.extend(range(start, end + 1))
@@ -75,25 +121,21 @@ def parse_mapping() -> Dict[str, dict]:
     current_series = "其他石刻系列"
     in_first_section = False
 
-    for line in INDEX_MD.read_text(encoding="utf-8").splitlines():
-        if line.startswith("## 一、"):
+    for matched in INDEX_LINE_RE.finditer(read_text_fast(INDEX_MD)):
+        section = matched.group("section")
+        if section == "一":
             in_first_section = True
             continue
-        if line.startswith("## 二、"):
-            in_first_section = False
+        if section == "二":
             break
         if not in_first_section:
             continue
 
-        if line.startswith("### "):
-            current_series = line.replace("### ", "").strip()
-            continue
-
-        matched = ROW_RE.match(line)
-        if not matched:
+        if matched.group("series") is not None:
+            current_series = matched.group("series").strip()
             continue
 
-        filename, page_text, topic = matched.groups()
+        filename, page_text, topic = matched.group("file", "pages", "topic")
         name = Path(filename.strip()).stem
         mapping[name] = {
             "series": current_series,
@@ -104,15 +146,23 @@ def parse_mapping() -> Dict[str, dict]:
     return mapping
 
 
+def read_texts(paths: List[Path]) -> List[str]:
+    # Many small files: overlap the reads on threads, results stay in input order.
+    with ThreadPoolExecutor(max_workers=TEXT_READ_WORKERS) as executor:
+        return list(executor.map(read_text_fast, paths))
+
+
 def parse_book_pages() -> Dict[int, dict]:
     pages: Dict[int, dict] = {}
+    numbered = []
     for path in sorted(PAGE_TEXT_DIR.glob("第*页.txt")):
-        match = re.search(r"第(\d+)页", path.stem)
-        if not match:
-            continue
-        page_no = int(match.group(1))
-        content = path.read_text(encoding="utf-8").strip()
-        title_match = re.search(r"^###\s+(.+)$", content, re.MULTILINE)
+        match = PAGE_NO_RE.search(path.stem)
+        if match:
+            numbered.append((int(match.group(1)), path))
+
+    for (page_no, _), raw in zip(numbered, read_texts([path for _, path in numbered])):
+        content = raw.strip()
+        title_match = TITLE_RE.search(content)
         pages[page_no] = {
             "title": title_match.group(1).strip() if title_match else "",
             "content": content
@@ -122,8 +172,8 @@ def parse_book_pages() -> Dict[int, dict]:
 
 def extract_tags(info_text: str, series: str) -> List[str]:
     tags = {series}
-    for piece in re.findall(r"【([^】]+)】", info_text):
-        for token in re.split(r"[、，/\s]+", piece):
+    for piece in TAG_BRACKET_RE.findall(info_text):
+        for token in TAG_SPLIT_RE.split(piece):
             token = token.strip("（）。()")
             if token:
                 tags.add(token)
@@ -132,38 +182,78 @@ def extract_tags(info_text: str, series: str) -> List[str]:
 
 def prepare_cache_dirs() -> None:
     for cache_dir in (MODEL_CACHE_DIR, INFO_CACHE_DIR):
-        if cache_dir.exists():
-            shutil.rmtree(cache_dir)
         cache_dir.mkdir(parents=True, exist_ok=True)
 
 
+def load_manifest() -> Dict[str, dict]:
+    try:
+        return json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def fingerprint_source(source: Path, artifact_id: str) -> dict:
+    stat = source.stat()
+    with source.open("rb") as handle:
+        head_sha1 = hashlib.sha1(handle.read(FINGERPRINT_BYTES)).hexdigest()
+    return {
+        "artifactId": artifact_id,
+        "mtimeNs": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": head_sha1
+    }
+
+
+def prune_cache_dir(cache_dir: Path, keep: Set[str]) -> None:
+    for path in cache_dir.glob("*.webp"):
+        if path.name not in keep:
+            path.unlink()
+
+
+def webp_variant_urls(artifact_id: str) -> Dict[str, str]:
+    return {
+        "thumb": encode_url_path("generated", "models", f"{artifact_id}-320.webp"),
+        "large": encode_url_path("generated", "models", f"{artifact_id}-720.webp")
+    }
+
+
+def cached_webp_variants(artifact_id: str) -> Optional[Dict[str, str]]:
+    thumb_path = MODEL_CACHE_DIR / f"{artifact_id}-320.webp"
+    large_path = MODEL_CACHE_DIR / f"{artifact_id}-720.webp"
+    if thumb_path.exists() and large_path.exists():
+        return webp_variant_urls(artifact_id)
+    return None
+
+
+def cached_info_variant(artifact_id: str) -> Optional[str]:
+    info_name = f"{artifact_id}-1280.webp"
+    if (INFO_CACHE_DIR / info_name).exists():
+        return encode_url_path("generated", "info", info_name)
+    return None
+
+
 def build_webp_variants(model_file: Path, artifact_id: str) -> Dict[str, str]:
     if not model_file.exists():
         return {"thumb": "", "large": ""}
 
-    thumb_name = f"{artifact_id}-320.webp"
-    large_name = f"{artifact_id}-720.webp"
-    thumb_path = MODEL_CACHE_DIR / thumb_name
-    large_path = MODEL_CACHE_DIR / large_name
+    thumb_path = MODEL_CACHE_DIR / f"{artifact_id}-320.webp"
+    large_path = MODEL_CACHE_DIR / f"{artifact_id}-720.webp"
+    urls = webp_variant_urls(artifact_id)
 
     try:
         with Image.open(model_file) as raw:
             image = raw.convert("RGBA")
 
-            thumb = image.copy()
-            thumb.thumbnail((320, 320), RESAMPLING)
-            thumb.save(thumb_path, format="WEBP", quality=82, method=6)
+            # Shrink in place: the thumb is resampled from the 720px result, not the original.
+            image.thumbnail((720, 720), RESAMPLING)
+            image.save(large_path, format="WEBP", quality=84, method=WEBP_METHOD)
 
-            large = image.copy()
-            large.thumbnail((720, 720), RESAMPLING)
-            large.save(large_path, format="WEBP", quality=84, method=6)
+            image.thumbnail((320, 320), RESAMPLING)
+            image.save(thumb_path, format="WEBP", quality=82, method=WEBP_METHOD)
     except Exception:
         return {"thumb": "", "large": ""}
 
-    return {
-        "thumb": encode_url_path("generated", "models", thumb_name),
-        "large": encode_url_path("generated", "models", large_name)
-    }
+    return urls
 
 
 def build_info_variant(info_file: Path, artifact_id: str) -> str:
@@ -172,11 +262,12 @@ def build_info_variant(info_file: Path, artifact_id: str) -> str:
 
     info_name = f"{artifact_id}-1280.webp"
     info_path = INFO_CACHE_DIR / info_name
+
     try:
         with Image.open(info_file) as raw:
             image = raw.convert("RGB")
             image.thumbnail((1280, 1280), RESAMPLING)
-            image.save(info_path, format="WEBP", quality=86, method=6)
+            image.save(info_path, format="WEBP", quality=86, method=WEBP_METHOD)
     except Exception:
         return ""
 
@@ -189,36 +280,92 @@ def build() -> dict:
     pdf_total_pages = max(page_map.keys(), default=0)
     prepare_cache_dirs()
 
-    model_names = {path.stem for path in MODEL_DIR.glob("*.png")}
-    info_names = {path.stem for path in INFO_IMAGE_DIR.glob("*.jpg")}
-    text_names = {path.stem for path in INFO_TEXT_DIR.glob("*.txt")}
+    model_names = stems(MODEL_DIR, ".png")
+    info_names = stems(INFO_IMAGE_DIR, ".jpg")
+    text_names = stems(INFO_TEXT_DIR, ".txt")
 
     all_names = sorted(model_names | info_names | text_names)
-    artifacts = []
+    jobs = [
+        (
+            f"artifact-{index:03d}",
+            MODEL_DIR / f"{name}.png" if name in model_names else None,
+            INFO_IMAGE_DIR / f"{name}.jpg" if name in info_names else None
+        )
+        for index, name in enumerate(all_names, start=1)
+    ]
+
+    # Sources whose fingerprint (and assigned id) match the last run keep their cached WebP.
+    previous_manifest = load_manifest()
+    manifest: Dict[str, dict] = {}
+    reuse: Dict[Path, bool] = {}
+    for artifact_id, model_file, info_image_file in jobs:
+        for source in (model_file, info_image_file):
+            if source is None:
+                continue
+            key = source.relative_to(ROOT).as_posix()
+            manifest[key] = fingerprint_source(source, artifact_id)
+            reuse[source] = previous_manifest.get(key) == manifest[key]
+
+    # Reused variants are resolved here so an unchanged build never starts the worker pool.
+    webp_results: Dict[str, Dict[str, str]] = {}
+    info_results: Dict[str, str] = {}
+    webp_pending = []
+    info_pending = []
+    for artifact_id, model_file, info_image_file in jobs:
+        if model_file is not None:
+            cached = cached_webp_variants(artifact_id) if reuse[model_file] else None
+            if cached is not None:
+                webp_results[artifact_id] = cached
+            else:
+                webp_pending.append((artifact_id, model_file))
+        if info_image_file is not None:
+            cached_info = cached_info_variant(artifact_id) if reuse[info_image_file] else None
+            if cached_info is not None:
+                info_results[artifact_id] = cached_info
+            else:
+                info_pending.append((artifact_id, info_image_file))
+
+    # WebP encoding is CPU-bound and independent per artifact.
+    pending_count = len(webp_pending) + len(info_pending)
+    if pending_count:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, pending_count)) as executor:
+            webp_futures = {
+                artifact_id: executor.submit(build_webp_variants, model_file, artifact_id)
+                for artifact_id, model_file in webp_pending
+            }
+            info_futures = {
+                artifact_id: executor.submit(build_info_variant, info_image_file, artifact_id)
+                for artifact_id, info_image_file in info_pending
+            }
+            webp_results.update((artifact_id, future.result()) for artifact_id, future in webp_futures.items())
+            info_results.update((artifact_id, future.result()) for artifact_id, future in info_futures.items())
+
+    prune_cache_dir(
+        MODEL_CACHE_DIR,
+        {Path(url).name for variants in webp_results.values() for url in variants.values() if url}
+    )
+    prune_cache_dir(INFO_CACHE_DIR, {Path(url).name for url in info_results.values() if url})
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    MANIFEST.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    for index, name in enumerate(all_names, start=1):
-        artifact_id = f"artifact-{index:03d}"
-        model_file = MODEL_DIR / f"{name}.png"
-        info_image_file = INFO_IMAGE_DIR / f"{name}.jpg"
-        info_text_file = INFO_TEXT_DIR / f"{name}.txt"
-        webp = build_webp_variants(model_file, artifact_id)
-        info_webp = build_info_variant(info_image_file, artifact_id)
+    text_name_list = list(text_names)
+    info_text_raw = read_texts([INFO_TEXT_DIR / f"{name}.txt" for name in text_name_list])
+    info_texts = {name: raw.strip() for name, raw in zip(text_name_list, info_text_raw)}
+
+    artifacts = []
+    referenced_pages: Set[int] = set()
+    for name, (artifact_id, _, _) in zip(all_names, jobs):
+        webp = webp_results.get(artifact_id, {"thumb": "", "large": ""})
+        info_webp = info_results.get(artifact_id, "")
 
         mapping_item = mapping.get(name, {})
         pages = mapping_item.get("pages", [])
         series = mapping_item.get("series", "") or infer_series(name)
-        info_text = info_text_file.read_text(encoding="utf-8").strip() if info_text_file.exists() else ""
-
-        linked_pdf = []
-        for page in pages:
-            text_info = page_map.get(page, {})
-            linked_pdf.append(
-                {
-                    "page": page,
-                    "title": text_info.get("title", ""),
-                    "content": text_info.get("content", "")
-                }
-            )
+        info_text = info_texts.get(name, "")
+
+        # Page text is emitted once at the top level; artifacts only reference page numbers.
+        linked_pdf = [{"page": page} for page in pages]
+        referenced_pages.update(page for page in pages if page in page_map)
 
         artifacts.append(
             {
@@ -250,14 +397,31 @@ def build() -> dict:
         if BOOK_PDF.exists() and BOOK_PDF.stat().st_size <= MAX_INLINE_PDF_SIZE
         else "",
         "pdfTotalPages": pdf_total_pages,
+        "pages": {str(page): page_map[page] for page in sorted(referenced_pages)},
         "artifacts": artifacts
     }
 
 
+def report_pillow_build() -> None:
+    flavor = "Pillow-SIMD" if PILLOW_SIMD else "Pillow"
+    turbo = features.check("libjpeg_turbo")
+    print(f"{flavor} {Image.__version__} (libjpeg-turbo: {turbo}, webp method={WEBP_METHOD})")
+
+
+def write_dataset(dataset: dict) -> None:
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    if orjson is not None:
+        # Byte-identical to json.dumps(ensure_ascii=False, indent=2), serialized in C.
+        OUTPUT.write_bytes(orjson.dumps(dataset, option=orjson.OPT_INDENT_2))
+        return
+    with OUTPUT.open("w", encoding="utf-8") as handle:
+        json.dump(dataset, handle, ensure_ascii=False, indent=2)
+
+
 def main() -> None:
+    report_pillow_build()
     dataset = build()
-    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
-    OUTPUT.write_text(json.dumps(dataset, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_dataset(dataset)
     print(f"Wrote {dataset['totalArtifacts']} artifacts -> {OUTPUT}")
 
 
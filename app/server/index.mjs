@@ -1060,6 +1060,7 @@ function loadArtifactCatalog() {
     const raw = readFileSync(ARTIFACT_DATA_PATH, "utf8");
     const dataset = JSON.parse(raw);
     const list = Array.isArray(dataset?.artifacts) ? dataset.artifacts : [];
+    const pages = dataset?.pages && typeof dataset.pages === "object" ? dataset.pages : {};
     return list
       .map((item) => {
         const id = safeString(item?.id);
@@ -1072,7 +1073,7 @@ function loadArtifactCatalog() {
         const infoText = toPlainText(safeString(item?.infoText));
         const linkedPdf = Array.isArray(item?.linkedPdf) ? item.linkedPdf : [];
         const linkedText = linkedPdf
-          .map((page) => toPlainText(safeString(page?.content)))
+          .map((page) => toPlainText(safeString(pages[String(page?.page)]?.content)))
           .filter(Boolean)
           .join(" ");
         const summary = clipText([infoText, linkedText].filter(Boolean).join(" ").trim(), 220);
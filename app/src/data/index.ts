@@ -2,8 +2,12 @@ import dataset from "@/data/artifacts.json";
 import type { Artifact, ArtifactDataset } from "@/types/artifact";
 
 const artifactDataset = dataset as ArtifactDataset;
+const pageTexts = artifactDataset.pages ?? {};
 
-export const artifacts = artifactDataset.artifacts;
+export const artifacts: Artifact[] = artifactDataset.artifacts.map((item) => ({
+  ...item,
+  linkedPdf: item.linkedPdf.map((link) => ({ ...link, ...pageTexts[String(link.page)] }))
+}));
 
 export function getArtifactById(id: string): Artifact | undefined {
   return artifacts.find((item) => item.id === id);
@@ -4,6 +4,11 @@ export interface LinkedPdf {
   content?: string;
 }
 
+export interface PdfPageText {
+  title: string;
+  content: string;
+}
+
 export interface Artifact {
   id: string;
   name: string;
@@ -24,5 +29,7 @@ export interface ArtifactDataset {
   totalArtifacts: number;
   pdfSource: string;
   pdfTotalPages: number;
+  // Book page texts referenced by artifacts, keyed by page number; linkedPdf only stores page numbers.
+  pages?: Record<string, PdfPageText>;
   artifacts: Artifact[];
 }
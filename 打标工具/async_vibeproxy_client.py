@@ -0,0 +1,181 @@
+import asyncio
+import io
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from vibeproxy_client import _VibeProxyBase, RETRY_STATUSES, logger, base64, orjson, _log_request_failure
+from config import CONCURRENCY, RETRY_BUDGET
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    # HTTP/2 需要 h2 包，且只在 https:// 地址上经 ALPN 协商生效；
+    # 默认的 http:// VIBEPROXY_URL 始终走 HTTP/1.1，并发请求分摊在连接池的多条连接上
+    import h2
+except ImportError:
+    h2 = None
+
+
+def _encode_jpeg(image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class AsyncVibeProxyClient(_VibeProxyBase):
+    """
+    基于 httpx.AsyncClient 的异步客户端
+    
+    与同步客户端共用载荷构造和缓存逻辑，但不继承基于 requests 的同步方法；
+    https:// 地址且安装了 h2 时多个请求复用同一条 HTTP/2 连接，其余情况使用 HTTP/1.1 连接池
+    """
+    
+    def __init__(self, use_cache: bool = True):
+        if httpx is None:
+            raise ImportError("缺少依赖: httpx 未安装。请安装 `pip install httpx[http2]`")
+        super().__init__(use_cache)
+        self.client = httpx.AsyncClient(
+            http2=h2 is not None,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout
+        )
+    
+    async def aclose(self) -> None:
+        """关闭底层连接"""
+        await self.client.aclose()
+    
+    async def __aenter__(self) -> "AsyncVibeProxyClient":
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+    
+    def _retry_delay(self, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        # 与同步客户端一致：1s、2s、4s… 的退避乘以随机因子
+        return min(30, 2 ** attempt) * random.uniform(0.5, 1.5)
+    
+    async def _post_json_async(self, url: str, body: bytes,
+                               extract: Callable[[Dict[str, Any]], Optional[str]]) -> Optional[str]:
+        deadline = time.monotonic() + RETRY_BUDGET
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(url, content=body)
+            except httpx.TransportError:
+                # 连接失败、读超时等传输层错误同样按退避重试，次数或时间预算用尽后抛出
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+                if time.monotonic() + delay > deadline:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            delay = self._retry_delay(attempt, response)
+            if time.monotonic() + delay > deadline:
+                break
+            await asyncio.sleep(delay)
+        response.raise_for_status()
+        if orjson is not None:
+            return extract(orjson.loads(response.content))
+        return extract(response.json())
+    
+    async def _extract_text_async(self, image_base64: bytes, mime_type: str, prompt: str) -> Optional[str]:
+        for url, build_payload, extract, _ in (self._primary, self._secondary):
+            try:
+                body = self._encode_body(build_payload(mime_type, prompt), image_base64)
+                text = await self._post_json_async(url, body, extract)
+            except (httpx.HTTPError, ValueError) as e:
+                _log_request_failure("API请求失败", e)
+                continue
+            if text:
+                return text
+        logger.error("主备端点均未返回结果，放弃本次提取")
+        return None
+    
+    async def _extract_with_cache_async(self, data: bytes, mime_type: str, prompt: str) -> Optional[str]:
+        text, cache_path, image_hash = await asyncio.to_thread(self._cache_lookup, data, prompt)
+        if text is not None:
+            return text
+        # 大图的base64编码放到线程中进行，不阻塞事件循环
+        image_base64 = await asyncio.to_thread(base64.b64encode, data)
+        text = await self._extract_text_async(image_base64, mime_type, prompt)
+        if text:
+            await asyncio.to_thread(self._cache_store, cache_path, image_hash, prompt, text)
+        return text
+    
+    async def extract_text_from_image(self, image_path: str, prompt: str) -> Optional[str]:
+        """从图片中提取文字内容，失败返回None"""
+        try:
+            data = await asyncio.to_thread(self._read_image, image_path)
+            return await self._extract_with_cache_async(data, self._sniff_mime_type(data), prompt)
+        except Exception:
+            logger.exception("处理图片 %s 时发生错误", image_path)
+            return None
+    
+    async def extract_text_from_image_bytes(self, data: bytes, mime_type: str, prompt: str) -> Optional[str]:
+        """从内存中的图片数据提取文字内容，失败返回None"""
+        try:
+            return await self._extract_with_cache_async(data, mime_type, prompt)
+        except Exception:
+            logger.exception("处理图片数据时发生错误")
+            return None
+    
+    async def extract_text_from_images(self, jobs: Iterable[str], prompt: str,
+                                       concurrency: int = CONCURRENCY) -> Dict[str, Optional[str]]:
+        """
+        并发提取多张图片的文字内容
+        
+        Args:
+            jobs: 图片文件路径序列
+            prompt: 提示词
+            concurrency: 最大并发请求数
+        
+        Returns:
+            以图片路径为键的结果字典，失败项的值为None
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(path: str) -> Optional[str]:
+            async with semaphore:
+                return await self.extract_text_from_image(path, prompt)
+        
+        paths = list(jobs)
+        texts = await asyncio.gather(*(run(path) for path in paths))
+        return dict(zip(paths, texts))
+    
+    async def extract_text_from_image_pil(self, image, prompt: str, quality: int = 95) -> Optional[str]:
+        """从内存中的PIL图片对象提取文字内容，JPEG编码在线程中进行"""
+        try:
+            data = await asyncio.to_thread(_encode_jpeg, image, quality)
+        except Exception:
+            logger.exception("编码图片时发生错误")
+            return None
+        return await self.extract_text_from_image_bytes(data, "image/jpeg", prompt)
+    
+    async def test_connection(self) -> bool:
+        """测试VibeProxy连接，成功结果在一段时间内复用"""
+        if self._connection_cached():
+            return True
+        now = time.monotonic()
+        try:
+            # 先用 HEAD 探测服务是否在线，无法判断时再发送完整的生成请求
+            response = await self.client.head(f"{self.base_url}/v1/models/{self.model_name}", timeout=3)
+            ok = response.status_code < 500 and response.status_code != 405
+            if not ok:
+                url, test_payload = self._probe_request()
+                response = await self.client.post(url, json=test_payload, timeout=10)
+                ok = response.status_code == 200
+        except Exception as e:
+            logger.warning("连接测试失败: %s", e)
+            return False
+        if ok:
+            self._connected_at = now
+        return ok
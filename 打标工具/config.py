@@ -1,12 +1,25 @@
 # 配置文件
+import os
+
 VIBEPROXY_URL = "http://127.0.0.1:8318"
 MODEL_NAME = "gemini-3-flash-preview"
 TIMEOUT = 300
 MAX_RETRIES = 3
+RETRY_BUDGET = 120  # 单次请求所有重试等待的总时长上限（秒）
+CONCURRENCY = int(os.getenv("VIBEPROXY_CONCURRENCY", "8"))  # 批量提取时的并发请求数
+# 模型响应的本地缓存目录，按 (图片, 提示词, 模型) 精确匹配；设为空字符串可关闭
+# 删除输出的 .txt 后若要让模型重新生成，需同时跳过缓存：命令行加 --no-cache，或设置 VIBEPROXY_CACHE_DIR=
+CACHE_DIR = os.getenv("VIBEPROXY_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".vibe_cache"))
+CACHE_TTL = int(os.getenv("VIBEPROXY_CACHE_TTL", str(30 * 24 * 3600)))  # 缓存有效期（秒），0 表示永不过期
+# 近似图片缓存：感知哈希（需安装 imagehash）距离不超过阈值的图片复用已有结果，适用于同一展品重新裁剪或压缩后的重跑
+PHASH_CACHE = os.getenv("VIBEPROXY_PHASH_CACHE", "0") == "1"
+PHASH_MAX_DISTANCE = 5
 
 # 图片处理配置
 SUPPORTED_FORMATS = ['.jpg', '.jpeg', '.png']
 MAX_IMAGE_SIZE = (2048, 2048)  # 最大尺寸限制
+MAX_IMAGE_BYTES = 8 * 1024 * 1024  # 超过此大小的图片先缩小为JPEG再发送
+BATCH_MAX_BYTES = 15 * 1024 * 1024  # 多图合并请求中图片base64的总大小上限
 QUALITY_THRESHOLD = 85  # 图片质量阈值
 
 # 提示词配置
@@ -40,3 +53,9 @@ PAGE_INTRO_PROMPT = """你是文博图像解读助手，需要为PDF的单页内
 中文段落
 > English translation
 """
+
+# 多图合并请求时附加在提示词之后
+BATCH_PROMPT = """
+
+以上要求分别适用于下面的每一张图片。共 {count} 张图片，按出现顺序编号为 0 到 {last}。
+只输出一个JSON数组，每张图片一项，形如 [{{"id": 0, "text": "该图片的提取结果"}}]，不要输出其他内容。"""
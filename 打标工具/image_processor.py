@@ -1,9 +1,78 @@
 import os
-from PIL import Image
-from typing import List, Tuple
+import struct
+from PIL import Image, ImageFilter, ImageStat
+from typing import BinaryIO, List, Optional, Tuple
 from config import SUPPORTED_FORMATS, MAX_IMAGE_SIZE
 
 
+# 预先归一化的扩展名集合，目录扫描时逐项做集合查找
+SUPPORTED_EXTENSIONS = frozenset(ext.lower() for ext in SUPPORTED_FORMATS)
+
+CONTRAST_FACTOR = 1.3  # 增加30%对比度
+SHARPNESS_FACTOR = 1.2
+# 等价于 blend(SMOOTH(img), img, SHARPNESS_FACTOR)；SMOOTH 核为 [1,1,1; 1,5,1; 1,1,1] / 13
+_SHARPEN_SIDE = -(SHARPNESS_FACTOR - 1) / 13
+SHARPEN_KERNEL = ImageFilter.Kernel(
+    (3, 3),
+    [_SHARPEN_SIDE] * 4 + [1 + (SHARPNESS_FACTOR - 1) * 8 / 13] + [_SHARPEN_SIDE] * 4,
+    scale=1
+)
+
+# JPEG 中携带尺寸的帧头标记（SOF0-SOF15，排除 DHT/JPG/DAC）
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    """逐段跳过 JPEG 标记直到帧头，只读取少量字节"""
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue  # 无长度字段的独立标记
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        if marker in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>xHH', frame)
+            return width, height
+        f.seek(struct.unpack('>H', length_bytes)[0] - 2, os.SEEK_CUR)
+
+
+def _read_header_size(image_path: str) -> Optional[Tuple[int, int, str]]:
+    """直接解析 PNG / JPEG / WebP 文件头获取尺寸，无法识别时返回None"""
+    with open(image_path, 'rb') as f:
+        header = f.read(32)
+        if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', header[16:24])
+            return width, height, 'PNG'
+        if header[:3] == b'\xff\xd8\xff':
+            size = _jpeg_size(f)
+            return (*size, 'JPEG') if size else None
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            chunk = header[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', header[26:30])
+                return width & 0x3FFF, height & 0x3FFF, 'WEBP'
+            if chunk == b'VP8L':
+                bits = struct.unpack('<I', header[21:25])[0]
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, 'WEBP'
+            if chunk == b'VP8X':
+                width = int.from_bytes(header[24:27], 'little') + 1
+                height = int.from_bytes(header[27:30], 'little') + 1
+                return width, height, 'WEBP'
+    return None
+
+
 class ImageProcessor:
     """图片预处理模块"""
     
@@ -11,7 +80,7 @@ class ImageProcessor:
     def is_supported_format(file_path: str) -> bool:
         """检查文件是否为支持的图片格式"""
         _, ext = os.path.splitext(file_path.lower())
-        return ext in SUPPORTED_FORMATS
+        return ext in SUPPORTED_EXTENSIONS
     
     @staticmethod
     def get_image_files(directory: str) -> List[str]:
@@ -19,104 +88,131 @@ class ImageProcessor:
         if not os.path.exists(directory):
             raise FileNotFoundError(f"目录不存在: {directory}")
         
-        image_files = []
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path) and ImageProcessor.is_supported_format(file_path):
-                image_files.append(file_path)
+        # scandir 一次遍历即可拿到文件类型，无需逐个 isfile 再 stat
+        with os.scandir(directory) as entries:
+            image_files = [
+                entry.path for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS
+            ]
         
         return sorted(image_files)  # 按文件名字母顺序排序
     
     @staticmethod
-    def preprocess_image(input_path: str, output_path: str = None) -> str:
+    def needs_preprocess(image_path: str) -> bool:
+        """判断图片是否需要预处理；尺寸已在限制内的RGB JPEG可直接发送原文件"""
+        try:
+            # Image.open 只解析文件头，不解码像素
+            with Image.open(image_path) as img:
+                return not (
+                    img.format == 'JPEG'
+                    and img.mode == 'RGB'
+                    and img.size[0] <= MAX_IMAGE_SIZE[0]
+                    and img.size[1] <= MAX_IMAGE_SIZE[1]
+                )
+        except Exception:
+            return True
+    
+    @staticmethod
+    def load_image(image_path: str, draft_size: Optional[Tuple[int, int]] = None) -> Optional[Image.Image]:
+        """
+        读取图片到内存并转换为RGB模式
+        
+        Args:
+            image_path: 图片路径
+            draft_size: 目标尺寸；JPEG会据此让libjpeg直接以1/2、1/4等比例解码
+            
+        Returns:
+            RGB模式的图片对象，读取失败返回None
+        """
+        try:
+            with Image.open(image_path) as img:
+                if draft_size is not None:
+                    img.draft('RGB', draft_size)
+                # convert 总会返回已载入像素的新对象，文件可随即关闭
+                return img.convert('RGB')
+        except Exception as e:
+            print(f"读取图片 {image_path} 时发生错误: {e}")
+            return None
+    
+    @staticmethod
+    def preprocess_image(img: Image.Image) -> Image.Image:
         """
-        预处理图片以优化OCR效果
+        预处理图片以优化OCR效果（在内存中完成，不写临时文件）
         
         Args:
-            input_path: 输入图片路径
-            output_path: 输出图片路径，如果为None则在原路径基础上添加_processed后缀
+            img: 输入图片对象
             
         Returns:
-            处理后的图片路径
+            处理后的图片对象
         """
         try:
-            # 打开图片
-            with Image.open(input_path) as img:
-                # 转换为RGB模式（如果是RGBA或其他模式）
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # 调整图片大小（如果超过限制）
-                if img.size[0] > MAX_IMAGE_SIZE[0] or img.size[1] > MAX_IMAGE_SIZE[1]:
-                    img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
-                
-                # 确定输出路径
-                if output_path is None:
-                    name, ext = os.path.splitext(input_path)
-                    output_path = f"{name}_processed{ext}"
-                
-                # 保存处理后的图片
-                img.save(output_path, 'JPEG', quality=95, optimize=True)
-                
-                return output_path
-                
+            # 转换为RGB模式（如果是RGBA或其他模式）
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            
+            # 调整图片大小（如果超过限制）
+            # 输出只给模型看，模型内部还会重采样，双线性已足够且比 LANCZOS 快数倍
+            if img.size[0] > MAX_IMAGE_SIZE[0] or img.size[1] > MAX_IMAGE_SIZE[1]:
+                img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.BILINEAR)
+            
+            return img
+            
         except Exception as e:
-            print(f"处理图片 {input_path} 时发生错误: {e}")
-            return input_path  # 返回原始路径作为后备
+            print(f"预处理图片时发生错误: {e}")
+            return img  # 返回原图作为后备
     
     @staticmethod
-    def enhance_image_contrast(input_path: str, output_path: str = None) -> str:
+    def enhance_image_contrast(img: Image.Image) -> Image.Image:
         """
-        增强图片对比度以改善文字识别效果
+        增强图片对比度以改善文字识别效果（在内存中完成，不写临时文件）
         
         Args:
-            input_path: 输入图片路径
-            output_path: 输出图片路径
+            img: 输入图片对象
             
         Returns:
-            处理后的图片路径
+            处理后的图片对象
         """
         try:
-            with Image.open(input_path) as img:
-                # 转换为RGB
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # 增强对比度
-                from PIL import ImageEnhance
-                enhancer = ImageEnhance.Contrast(img)
-                enhanced_img = enhancer.enhance(1.3)  # 增加30%对比度
-                
-                # 增强锐度
-                sharpness_enhancer = ImageEnhance.Sharpness(enhanced_img)
-                final_img = sharpness_enhancer.enhance(1.2)
-                
-                # 确定输出路径
-                if output_path is None:
-                    name, ext = os.path.splitext(input_path)
-                    output_path = f"{name}_enhanced{ext}"
-                
-                # 保存
-                final_img.save(output_path, 'JPEG', quality=95)
-                
-                return output_path
-                
+            # 转换为RGB
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            
+            # 增强对比度：与 ImageEnhance.Contrast 相同，以灰度均值为中心线性拉伸，
+            # 但用查表一次完成，无需构造整幅灰度图再混合
+            mean = int(ImageStat.Stat(img.convert('L')).mean[0] + 0.5)
+            lut = [min(255, max(0, int(mean + CONTRAST_FACTOR * (v - mean) + 0.5))) for v in range(256)]
+            enhanced_img = img.point(lut * 3)
+            
+            # 增强锐度：ImageEnhance.Sharpness 是与 SMOOTH 平滑图的混合，
+            # 这里把两步合成一个 3x3 卷积核，一次滤波完成
+            return enhanced_img.filter(SHARPEN_KERNEL)
+            
         except Exception as e:
             print(f"增强图片对比度时发生错误: {e}")
-            return input_path
+            return img
+    
+    @staticmethod
+    def save_image(img: Image.Image, output_path: str, final_output: bool = False) -> str:
+        """将处理后的图片保存为JPEG（仅在需要保留中间结果时使用）"""
+        # optimize 会多跑一遍霍夫曼表搜索，编码耗时约翻倍，只为最终产物开启
+        img.save(output_path, 'JPEG', quality=95, optimize=final_output)
+        return output_path
     
     @staticmethod
     def get_image_info(image_path: str) -> dict:
-        """获取图片基本信息"""
+        """获取图片基本信息（宽、高、格式、文件大小；常见格式只解析文件头）"""
         try:
-            with Image.open(image_path) as img:
-                return {
-                    'width': img.width,
-                    'height': img.height,
-                    'mode': img.mode,
-                    'format': img.format,
-                    'size_mb': os.path.getsize(image_path) / (1024 * 1024)
-                }
+            parsed = _read_header_size(image_path)
+            if parsed is None:
+                with Image.open(image_path) as img:
+                    parsed = (img.width, img.height, img.format)
+            width, height, image_format = parsed
+            return {
+                'width': width,
+                'height': height,
+                'format': image_format,
+                'size_mb': os.stat(image_path).st_size / (1024 * 1024)
+            }
         except Exception as e:
             print(f"获取图片信息失败: {e}")
-            return {}
\ No newline at end of file
+            return {}
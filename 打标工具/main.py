@@ -21,11 +21,13 @@ def main():
                        help='启用图片对比度增强')
     parser.add_argument('--preview', action='store_true',
                        help='预览模式（不保存结果）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='跳过模型响应缓存（删除输出文件后重新生成时使用）')
     
     args = parser.parse_args()
     
     # 初始化提取器
-    extractor = TextExtractor()
+    extractor = TextExtractor(use_cache=not args.no_cache)
     
     # 检查输入路径
     if not os.path.exists(args.input_path):
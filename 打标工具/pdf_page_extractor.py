@@ -1,6 +1,7 @@
 import argparse
 import os
-from typing import Optional, List
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, List
 from tqdm import tqdm
 from vibeproxy_client import VibeProxyClient
 from config import PAGE_INTRO_PROMPT
@@ -11,29 +12,55 @@ except ImportError:
     fitz = None
 
 
+# 渲染子进程各自持有的文档句柄（fitz.Document 不可跨进程传递）
+_worker_doc = None
+
+
+def _init_render_worker(pdf_path: str) -> None:
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _render_in_worker(page_index: int, dpi: int) -> Optional[bytes]:
+    return PDFPageExtractor._render_page_to_image(_worker_doc, page_index, dpi)
+
+
 class PDFPageExtractor:
-    def __init__(self):
-        self.client = VibeProxyClient()
+    def __init__(self, use_cache: bool = True):
+        self.client = VibeProxyClient(use_cache=use_cache)
+        self._doc = None
+        self._doc_path: Optional[str] = None
     
-    def _render_page_to_image(self, pdf_path: str, page_index: int, dpi: int = 300) -> Optional[str]:
-        if fitz is None:
-            print("缺少依赖: PyMuPDF 未安装。请安装 `pip install PyMuPDF`")
-            return None
+    def _open(self, pdf_path: str):
+        """按路径复用已打开的文档，避免每页重复解析 xref"""
+        if self._doc is None or self._doc_path != pdf_path:
+            self.close()
+            self._doc = fitz.open(pdf_path)
+            self._doc_path = pdf_path
+        return self._doc
+    
+    def close(self) -> None:
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+            self._doc_path = None
+    
+    @staticmethod
+    def _render_page_to_image(doc, page_index: int, dpi: int = 300) -> Optional[bytes]:
+        """渲染单页为内存中的JPEG数据，不落盘"""
         try:
-            doc = fitz.open(pdf_path)
             page = doc.load_page(page_index)
             zoom = dpi / 72.0
             mat = fitz.Matrix(zoom, zoom)
             pix = page.get_pixmap(matrix=mat, alpha=False)
-            img_path = f"{os.path.splitext(pdf_path)[0]}_page_{page_index+1}.png"
-            pix.save(img_path)
-            doc.close()
-            return img_path
+            # 对模型识别而言 q=90 的 JPEG 与 PNG 无明显差别，但编码更快、体积小得多
+            return pix.tobytes("jpeg", jpg_quality=90)
         except Exception as e:
             print(f"渲染PDF页面失败: {e}")
             return None
     
-    def extract_page_intros(self, pdf_path: str, output_dir: Optional[str] = None, dpi: int = 300) -> dict:
+    def extract_page_intros(self, pdf_path: str, output_dir: Optional[str] = None, dpi: int = 300,
+                            workers: Optional[int] = None) -> dict:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF不存在: {pdf_path}")
         if output_dir is None:
@@ -41,62 +68,100 @@ class PDFPageExtractor:
         os.makedirs(output_dir, exist_ok=True)
         
         if fitz is None:
+            print("缺少依赖: PyMuPDF 未安装。请安装 `pip install PyMuPDF`")
             return {"total": 0, "success": 0, "failed": 0, "output_dir": output_dir}
         
-        doc = fitz.open(pdf_path)
-        total_pages = doc.page_count
-        doc.close()
+        try:
+            return self._extract_page_intros(pdf_path, output_dir, dpi, workers)
+        finally:
+            self.close()
+    
+    def _extract_page_intros(self, pdf_path: str, output_dir: str, dpi: int, workers: Optional[int]) -> dict:
+        total_pages = self._open(pdf_path).page_count
+        
+        pending = [
+            i for i in range(total_pages)
+            if not os.path.exists(os.path.join(output_dir, f"第{i+1}页.txt"))
+        ]
+        pending_set = set(pending)
+        workers = workers or os.cpu_count() or 1
+        # 渲染是 CPU 密集型，交给进程池提前渲染；模型调用依赖上页摘要，仍按页序逐个进行
+        # 单进程时直接复用本进程的文档句柄顺序渲染
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_render_worker,
+                initargs=(pdf_path,)
+            )
+        renders: Dict[int, Future] = {}
+        render_queue = iter(pending)
+        
+        def schedule_renders() -> None:
+            # 限制预渲染数量，避免未处理的整页图片堆积在内存中
+            while executor is not None and len(renders) < workers * 2:
+                page_index = next(render_queue, None)
+                if page_index is None:
+                    return
+                renders[page_index] = executor.submit(_render_in_worker, page_index, dpi)
         
         prev_summary = ""
         success = 0
         failed_pages: List[int] = []
         
-        for i in tqdm(range(total_pages), desc="处理进度"):
-            out_path = os.path.join(output_dir, f"第{i+1}页.txt")
-            if os.path.exists(out_path):
-                with open(out_path, "r", encoding="utf-8") as f:
-                    existing_text = f.read().strip()
-                lines = [line.strip() for line in existing_text.splitlines() if line.strip()]
-                summary_line = ""
-                for line in lines:
-                    if not line.startswith("#"):
-                        summary_line = line
-                        break
-                if summary_line:
-                    prev_summary = summary_line[:200]
-                success += 1
-                continue
-            
-            img_path = self._render_page_to_image(pdf_path, i, dpi=dpi)
-            if not img_path:
-                failed_pages.append(i + 1)
-                continue
-            
-            prompt = PAGE_INTRO_PROMPT.format(
-                page_number=i + 1,
-                total_pages=total_pages,
-                previous_summary=prev_summary
-            )
-            text = self.client.extract_text_from_image(img_path, prompt)
-            try:
-                os.remove(img_path)
-            except:
-                pass
-            
-            if text:
-                with open(out_path, "w", encoding="utf-8") as f:
-                    f.write(text.strip())
-                lines = [line.strip() for line in text.splitlines() if line.strip()]
-                summary_line = ""
-                for line in lines:
-                    if not line.startswith("#"):
-                        summary_line = line
-                        break
-                if summary_line:
-                    prev_summary = summary_line[:200]
-                success += 1
-            else:
-                failed_pages.append(i + 1)
+        try:
+            schedule_renders()
+            for i in tqdm(range(total_pages), desc="处理进度"):
+                out_path = os.path.join(output_dir, f"第{i+1}页.txt")
+                if i not in pending_set:
+                    with open(out_path, "r", encoding="utf-8") as f:
+                        existing_text = f.read().strip()
+                    lines = [line.strip() for line in existing_text.splitlines() if line.strip()]
+                    summary_line = ""
+                    for line in lines:
+                        if not line.startswith("#"):
+                            summary_line = line
+                            break
+                    if summary_line:
+                        prev_summary = summary_line[:200]
+                    success += 1
+                    continue
+                
+                if executor is None:
+                    image_data = self._render_page_to_image(self._open(pdf_path), i, dpi)
+                else:
+                    image_data = renders.pop(i).result()
+                    schedule_renders()
+                if not image_data:
+                    failed_pages.append(i + 1)
+                    continue
+                
+                prompt = PAGE_INTRO_PROMPT.format(
+                    page_number=i + 1,
+                    total_pages=total_pages,
+                    previous_summary=prev_summary
+                )
+                text = self.client.extract_text_from_image_bytes(image_data, "image/jpeg", prompt)
+                
+                if text:
+                    with open(out_path, "w", encoding="utf-8") as f:
+                        f.write(text.strip())
+                    lines = [line.strip() for line in text.splitlines() if line.strip()]
+                    summary_line = ""
+                    for line in lines:
+                        if not line.startswith("#"):
+                            summary_line = line
+                            break
+                    if summary_line:
+                        prev_summary = summary_line[:200]
+                    success += 1
+                else:
+                    failed_pages.append(i + 1)
+        finally:
+            if executor is not None:
+                for future in renders.values():
+                    future.cancel()
+                executor.shutdown(wait=True)
         
         return {
             "total": total_pages,
@@ -112,10 +177,12 @@ def main():
     parser.add_argument("pdf_path", help="输入PDF路径")
     parser.add_argument("-o", "--output", help="输出目录路径")
     parser.add_argument("--dpi", type=int, default=300, help="渲染DPI")
+    parser.add_argument("--workers", type=int, default=None, help="渲染进程数（默认CPU核数）")
+    parser.add_argument("--no-cache", action="store_true", help="跳过模型响应缓存（删除页面 .txt 后重新生成时使用）")
     args = parser.parse_args()
     
-    extractor = PDFPageExtractor()
-    result = extractor.extract_page_intros(args.pdf_path, args.output, args.dpi)
+    extractor = PDFPageExtractor(use_cache=not args.no_cache)
+    result = extractor.extract_page_intros(args.pdf_path, args.output, args.dpi, args.workers)
     if result["failed"] > 0:
         raise SystemExit(1)
 
@@ -1,16 +1,17 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Optional
 from vibeproxy_client import VibeProxyClient
 from image_processor import ImageProcessor
-from config import EXTRACTION_PROMPT
+from config import EXTRACTION_PROMPT, CONCURRENCY, MAX_IMAGE_SIZE
 from tqdm import tqdm
 
 
 class TextExtractor:
     """核心文字提取器"""
     
-    def __init__(self):
-        self.vibeproxy_client = VibeProxyClient()
+    def __init__(self, use_cache: bool = True):
+        self.vibeproxy_client = VibeProxyClient(use_cache=use_cache)
         self.image_processor = ImageProcessor()
     
     def extract_single_image(self, image_path: str, output_dir: str = None, 
@@ -52,19 +53,31 @@ class TextExtractor:
                 print(f"输出文件已存在，跳过: {output_path}")
                 return True
             
-            # 图片预处理
-            processed_image = image_path
-            if preprocess:
-                processed_image = self.image_processor.preprocess_image(image_path)
+            # 图片预处理（全程在内存中完成，只在发送前编码一次）
+            image = None
+            if preprocess and not enhance and not self.image_processor.needs_preprocess(image_path):
+                preprocess = False  # 已满足要求，直接发送原文件，省去解码与重新编码
+            if preprocess or enhance:
+                image = self.image_processor.load_image(
+                    image_path, MAX_IMAGE_SIZE if preprocess else None
+                )
             
-            if enhance:
-                processed_image = self.image_processor.enhance_image_contrast(processed_image)
+            if image is not None:
+                if preprocess:
+                    image = self.image_processor.preprocess_image(image)
+                if enhance:
+                    image = self.image_processor.enhance_image_contrast(image)
             
             # 调用VibeProxy提取文字
             print(f"正在处理: {os.path.basename(image_path)}")
-            extracted_text = self.vibeproxy_client.extract_text_from_image(
-                processed_image, EXTRACTION_PROMPT
-            )
+            if image is not None:
+                extracted_text = self.vibeproxy_client.extract_text_from_image_pil(
+                    image, EXTRACTION_PROMPT
+                )
+            else:
+                extracted_text = self.vibeproxy_client.extract_text_from_image(
+                    image_path, EXTRACTION_PROMPT
+                )
             
             if extracted_text:
                 # 保存提取的文字
@@ -72,14 +85,6 @@ class TextExtractor:
                     f.write(extracted_text.strip())
                 
                 print(f"成功提取并保存到: {output_path}")
-                
-                # 清理临时处理文件
-                if processed_image != image_path:
-                    try:
-                        os.remove(processed_image)
-                    except:
-                        pass
-                
                 return True
             else:
                 print(f"提取失败: {image_path}")
@@ -128,16 +133,28 @@ class TextExtractor:
             print("警告: 无法连接到VibeProxy服务，请检查服务是否运行")
             return {"total": len(image_files), "success": 0, "failed": len(image_files)}
         
-        # 批量处理
+        # 批量处理：耗时主要在等待接口响应，用线程池并发请求
         success_count = 0
-        failed_files = []
+        failed_paths = []
         
         print("\n开始批量提取...")
-        for image_path in tqdm(image_files, desc="处理进度"):
-            if self.extract_single_image(image_path, output_dir, preprocess, enhance):
-                success_count += 1
-            else:
-                failed_files.append(os.path.basename(image_path))
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor, \
+                tqdm(total=len(image_files), desc="处理进度") as pbar:
+            futures = {
+                executor.submit(self.extract_single_image, image_path, output_dir, preprocess, enhance): image_path
+                for image_path in image_files
+            }
+            # 结果只在当前线程汇总，计数无需加锁
+            for future in as_completed(futures):
+                if future.result():
+                    success_count += 1
+                else:
+                    failed_paths.append(futures[future])
+                pbar.update(1)
+        
+        # 按输入顺序输出失败列表
+        order = {path: index for index, path in enumerate(image_files)}
+        failed_files = [os.path.basename(path) for path in sorted(failed_paths, key=order.__getitem__)]
         
         result = {
             "total": len(image_files),
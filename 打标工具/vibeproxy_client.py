@@ -1,115 +1,475 @@
-import base64
+import hashlib
+import io
 import json
+import logging
+import os
+import random
+import socket
+import threading
 import time
-from typing import Dict, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 import requests
-from config import VIBEPROXY_URL, MODEL_NAME, TIMEOUT, MAX_RETRIES
+from requests.adapters import HTTPAdapter
+from PIL import Image
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import InvalidHeader, MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
 
+try:
+    # 可选：SIMD 实现的 base64 编解码，接口与标准库一致
+    import pybase64 as base64
+except ImportError:
+    import base64
 
-class VibeProxyClient:
-    """VibeProxy Gemini3Flash 客户端封装"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # 可选：近似图片缓存所需的感知哈希
+    import imagehash
+except ImportError:
+    imagehash = None
+
+try:
+    # 可选：流式解析响应，拿到生成文本后不再解析其余内容
+    import ijson
+except ImportError:
+    ijson = None
+
+from config import VIBEPROXY_URL, MODEL_NAME, TIMEOUT, MAX_RETRIES, RETRY_BUDGET, CONCURRENCY, CACHE_DIR, CACHE_TTL, MAX_IMAGE_BYTES, MAX_IMAGE_SIZE
+from config import PHASH_CACHE, PHASH_MAX_DISTANCE, BATCH_MAX_BYTES, BATCH_PROMPT
+
+
+logger = logging.getLogger(__name__)
+
+# 连接测试成功后的复用时长（秒）
+CONNECTION_CHECK_TTL = 60
+
+# 载荷中图片数据的占位符，序列化后在此处直接拼接base64字节
+_IMAGE_PLACEHOLDER = "\x00"
+_IMAGE_PLACEHOLDER_JSON = b"\\u0000"
+
+# 常见图片格式的文件头（WebP 需额外检查第 8~12 字节，单独处理）
+_MIME_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif")
+)
+
+# 生成文本在响应中的位置（ijson 前缀写法）
+_GEMINI_TEXT_PATH = "candidates.item.content.parts.item.text"
+_OPENAI_TEXT_PATH = "choices.item.message.content"
+
+# 需要退避重试的响应状态码
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# 请求失败或响应无法解析时改试备用端点
+_RESPONSE_ERRORS = (requests.exceptions.RequestException, ValueError) + ((ijson.JSONError,) if ijson is not None else ())
+
+
+def _log_request_failure(message: str, error: Exception) -> None:
+    """记录单次请求失败；重试用尽后仍被限流（429）时按错误级别记录，便于筛出真正的失败"""
+    response = getattr(error, "response", None)
+    if response is not None and response.status_code == 429:
+        logger.error("%s（重试后仍被限流）: %s", message, error)
+    else:
+        logger.warning("%s: %s", message, error)
+
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def _parse_batch_texts(text: str, count: int) -> Dict[int, str]:
+    """解析多图请求返回的JSON数组，模型偶尔会包一层 ``` 代码块"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        items = json.loads(text)
+    except ValueError:
+        return {}
+    results: Dict[int, str] = {}
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("id"), int) and isinstance(item.get("text"), str):
+                if 0 <= item["id"] < count and item["text"]:
+                    results[item["id"]] = item["text"]
+    return results
+
+
+def _extract_gemini_text(result: Dict[str, Any]) -> Optional[str]:
+    try:
+        return result['candidates'][0]['content']['parts'][0]['text']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _extract_openai_text(result: Dict[str, Any]) -> Optional[str]:
+    try:
+        return result['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class _JitteredRetry(Retry):
+    """带随机抖动的指数退避，并限制单次请求的重试总耗时"""
+    
+    BACKOFF_CAP = 30
+    deadline: Optional[float] = None
+    planned_backoff: Optional[float] = None
+    
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.deadline = self.deadline
+        return retry
+    
+    def get_backoff_time(self) -> float:
+        # 与原先 1s、2s、4s… 的退避节奏一致，乘以 0.5~1.5 的随机因子，避免多个并发请求同时重试
+        if not self.history:
+            return 0
+        delay = min(self.BACKOFF_CAP, self.backoff_factor * 2 ** (len(self.history) - 1))
+        return delay * random.uniform(0.5, 1.5)
+    
+    def get_retry_after(self, response) -> Optional[float]:
+        # 无法解析的 Retry-After 按未提供处理，改用退避时间
+        try:
+            return super().get_retry_after(response)
+        except InvalidHeader:
+            return None
+    
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        now = time.monotonic()
+        if retry.deadline is None:
+            retry.deadline = now + RETRY_BUDGET
+        delay = None
+        if response is not None and retry.respect_retry_after_header:
+            delay = retry.get_retry_after(response)
+        # 与 urllib3 的 sleep() 一致：Retry-After 缺失或为 0 时按退避时间等待
+        if not delay:
+            # 退避时间带随机因子，只抽取一次并记下，实际等待与预算检查使用同一个值
+            delay = retry.planned_backoff = retry.get_backoff_time()
+        if now + delay > retry.deadline:
+            raise MaxRetryError(_pool, url, error or ResponseError("重试总耗时超出上限"))
+        return retry
     
-    def __init__(self):
+    def _sleep_backoff(self) -> None:
+        backoff = self.planned_backoff if self.planned_backoff is not None else self.get_backoff_time()
+        if backoff > 0:
+            time.sleep(backoff)
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """显式关闭 Nagle 并开启 TCP keepalive，长时间批处理中空闲连接不易被中间设备断开"""
+    
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    ]
+    
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault("socket_options", self.SOCKET_OPTIONS)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+
+class _VibeProxyBase:
+    """同步与异步客户端共用的部分：配置、载荷构造、响应缓存与图片读取，不涉及具体的HTTP传输"""
+    
+    def __init__(self, use_cache: bool = True):
         self.base_url = VIBEPROXY_URL
         self.model_name = MODEL_NAME
         self.timeout = TIMEOUT
         self.max_retries = MAX_RETRIES
+        # use_cache=False 时既不读取也不写入缓存，用于强制重新生成结果
+        self.cache_dir = CACHE_DIR if use_cache else ""
+        if PHASH_CACHE and imagehash is None:
+            logger.warning("已设置 VIBEPROXY_PHASH_CACHE=1，但 imagehash 未安装，近似图片缓存不会生效")
+        self._connected_at: Optional[float] = None
+        self._phash_buckets: Dict[str, List[Tuple[Any, str]]] = {}
+        self._phash_lock = threading.Lock()
+        
+        # 端点类型只判断一次：8318 端口的代理优先走 OpenAI 兼容接口，另一种作为备用
+        self._prefers_openai = ":8318" in self.base_url
+        self._gemini_url = f"{self.base_url}/v1/models/{self.model_name}:generateContent"
+        self._openai_url = f"{self.base_url}/v1/chat/completions"
+        gemini = (self._gemini_url, self._build_gemini_payload, _extract_gemini_text, _GEMINI_TEXT_PATH)
+        openai = (self._openai_url, self._build_openai_payload, _extract_openai_text, _OPENAI_TEXT_PATH)
+        self._primary, self._secondary = (openai, gemini) if self._prefers_openai else (gemini, openai)
+        
+        # 载荷中与单次请求无关的部分只构造一次，各请求共享（序列化时只读，不会被修改）
+        self._gen_cfg = {
+            "temperature": 0.1,  # 低温度确保准确性
+            "max_output_tokens": 2048
+        }
+        self._openai_tail = {
+            "model": self.model_name,
+            "temperature": 0.1,
+            "max_tokens": 2048
+        }
     
-    def _encode_image(self, image_path: str) -> str:
-        """将图片编码为base64字符串"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    def _cache_path(self, data: bytes, prompt: str) -> str:
+        image_hash = hashlib.sha256(data).hexdigest()
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        key = hashlib.sha256(f"{image_hash}:{prompt_hash}:{self.model_name}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
     
-    def _get_mime_type(self, image_path: str) -> str:
-        ext = image_path.lower().rsplit(".", 1)[-1] if "." in image_path else ""
-        if ext == "png":
-            return "image/png"
-        return "image/jpeg"
+    def _cache_get(self, cache_path: str) -> Optional[str]:
+        try:
+            if CACHE_TTL > 0 and time.time() - os.path.getmtime(cache_path) > CACHE_TTL:
+                return None
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
     
-    def _make_request_gemini(self, payload: Dict[str, Any]) -> Optional[str]:
-        url = f"{self.base_url}/v1/models/{self.model_name}:generateContent"
-        
-        for attempt in range(self.max_retries):
+    def _cache_put(self, cache_path: str, text: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # 先写临时文件再替换，并发写同一键时不会读到半截内容
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("写入缓存失败: %s", e)
+    
+    def _phash_index_path(self, prompt: str) -> str:
+        bucket_key = hashlib.sha256(f"{prompt}:{self.model_name}".encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, "phash", f"{bucket_key}.tsv")
+    
+    def _phash_bucket(self, index_path: str) -> List[Tuple[Any, str]]:
+        """按 (提示词, 模型) 分桶的感知哈希索引，首次访问时从磁盘载入；调用方需持有 _phash_lock"""
+        bucket = self._phash_buckets.get(index_path)
+        if bucket is None:
+            bucket = []
             try:
-                response = requests.post(
-                    url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=self.timeout
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    # 提取生成的文本内容
-                    if 'candidates' in result and len(result['candidates']) > 0:
-                        content = result['candidates'][0].get('content', {})
-                        if 'parts' in content and len(content['parts']) > 0:
-                            return content['parts'][0].get('text', '')
-                    return None
-                    
-                elif response.status_code == 429:  # 速率限制
-                    if attempt < self.max_retries - 1:
-                        time.sleep(2 ** attempt)  # 指数退避
-                        continue
-                    else:
-                        print(f"API调用达到速率限制，已重试{self.max_retries}次")
-                        return None
-                        
-                else:
-                    print(f"API请求失败: {response.status_code} - {response.text}")
-                    return None
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"请求异常 (尝试 {attempt + 1}/{self.max_retries}): {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(1)
-                    continue
-                else:
-                    return None
-        
-        return None
+                with open(index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        phash_hex, _, rel_path = line.rstrip("\n").partition("\t")
+                        bucket.append((imagehash.hex_to_hash(phash_hex), rel_path))
+            except (OSError, ValueError):
+                pass
+            self._phash_buckets[index_path] = bucket
+        return bucket
+    
+    def _perceptual_hash(self, data: bytes) -> Any:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                # 感知哈希只看 32x32 灰度图，JPEG 可直接按小比例解码
+                img.draft('L', (256, 256))
+                return imagehash.phash(img)
+        except Exception:
+            return None
     
-    def _make_request_openai(self, payload: Dict[str, Any]) -> Optional[str]:
-        url = f"{self.base_url}/v1/chat/completions"
+    def _cache_lookup(self, data: bytes, prompt: str) -> Tuple[Optional[str], Optional[str], Any]:
+        """
+        依次查询精确缓存与近似图片缓存
         
-        for attempt in range(self.max_retries):
+        Returns:
+            (缓存的文本, 精确缓存路径, 感知哈希)；未启用缓存时路径为None
+        """
+        if not self.cache_dir:
+            return None, None, None
+        cache_path = self._cache_path(data, prompt)
+        text = self._cache_get(cache_path)
+        if text is not None or not (PHASH_CACHE and imagehash is not None):
+            return text, cache_path, None
+        image_hash = self._perceptual_hash(data)
+        if image_hash is None:
+            return None, cache_path, None
+        with self._phash_lock:
+            similar = [rel_path for stored, rel_path in self._phash_bucket(self._phash_index_path(prompt))
+                       if image_hash - stored <= PHASH_MAX_DISTANCE]
+        for rel_path in similar:
+            text = self._cache_get(os.path.join(self.cache_dir, rel_path))
+            if text is not None:
+                return text, cache_path, None
+        return None, cache_path, image_hash
+    
+    def _cache_store(self, cache_path: Optional[str], image_hash: Any, prompt: str, text: str) -> None:
+        if not cache_path:
+            return
+        self._cache_put(cache_path, text)
+        if image_hash is None:
+            return
+        rel_path = os.path.relpath(cache_path, self.cache_dir)
+        index_path = self._phash_index_path(prompt)
+        with self._phash_lock:
+            self._phash_bucket(index_path).append((image_hash, rel_path))
             try:
-                response = requests.post(
-                    url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=self.timeout
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    choices = result.get("choices", [])
-                    if choices:
-                        message = choices[0].get("message", {})
-                        return message.get("content", "")
-                    return None
-                    
-                elif response.status_code == 429:
-                    if attempt < self.max_retries - 1:
-                        time.sleep(2 ** attempt)
-                        continue
-                    else:
-                        print(f"API调用达到速率限制，已重试{self.max_retries}次")
-                        return None
-                        
-                else:
-                    print(f"API请求失败: {response.status_code} - {response.text}")
-                    return None
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"请求异常 (尝试 {attempt + 1}/{self.max_retries}): {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(1)
-                    continue
-                else:
-                    return None
-        
-        return None
+                os.makedirs(os.path.dirname(index_path), exist_ok=True)
+                with open(index_path, "a", encoding="utf-8") as f:
+                    f.write(f"{image_hash}\t{rel_path}\n")
+            except OSError as e:
+                logger.warning("写入缓存失败: %s", e)
+    
+    def _sniff_mime_type(self, data: bytes) -> str:
+        """根据文件头判断图片类型，无法识别时按JPEG处理"""
+        for signature, mime_type in _MIME_SIGNATURES:
+            if data.startswith(signature):
+                return mime_type
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return "image/webp"
+        return "image/jpeg"
+    
+    def _get_mime_type(self, image_path: str) -> str:
+        with open(image_path, "rb") as f:
+            return self._sniff_mime_type(f.read(12))
+    
+    def _read_image(self, image_path: str) -> bytes:
+        """读取图片数据；超过 MAX_IMAGE_BYTES 的大图先缩小到 MAX_IMAGE_SIZE 以内再以JPEG编码，省去大量base64与传输开销"""
+        if os.path.getsize(image_path) > MAX_IMAGE_BYTES:
+            # 解码失败记入日志后退回原始数据，不经 ImageProcessor（其以 print 报错）
+            try:
+                with Image.open(image_path) as img:
+                    img.draft('RGB', MAX_IMAGE_SIZE)
+                    img = img.convert('RGB')
+                img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.BILINEAR)
+                buffer = io.BytesIO()
+                img.save(buffer, 'JPEG', quality=85, optimize=True)
+                return buffer.getvalue()
+            except Exception:
+                logger.warning("缩小图片 %s 失败，改为发送原始数据", image_path, exc_info=True)
+        with open(image_path, "rb") as image_file:
+            return image_file.read()
+    
+    def _build_gemini_payload(self, mime_type: str, prompt: str) -> Dict[str, Any]:
+        return {
+            "contents": [{
+                "parts": [
+                    {"text": prompt},
+                    {
+                        "inline_data": {
+                            "mime_type": mime_type,
+                            "data": _IMAGE_PLACEHOLDER
+                        }
+                    }
+                ]
+            }],
+            "generation_config": self._gen_cfg
+        }
+    
+    def _build_openai_payload(self, mime_type: str, prompt: str) -> Dict[str, Any]:
+        return {
+            **self._openai_tail,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{_IMAGE_PLACEHOLDER}"
+                            }
+                        }
+                    ]
+                }
+            ]
+        }
+    
+    def _probe_request(self) -> Tuple[str, Dict[str, Any]]:
+        """连接测试用的最小生成请求"""
+        if self._prefers_openai:
+            return self._openai_url, {
+                "model": self.model_name,
+                "messages": [{"role": "user", "content": "你好"}]
+            }
+        return self._gemini_url, {
+            "contents": [{
+                "parts": [{"text": "你好"}]
+            }]
+        }
+    
+    def _connection_cached(self) -> bool:
+        return self._connected_at is not None and time.monotonic() - self._connected_at < CONNECTION_CHECK_TTL
+    
+    def _encode_body(self, payload: Dict[str, Any], image_base64: bytes) -> bytes:
+        """序列化载荷并在占位符处拼入base64字节，省去中间的大字符串与二次JSON编码"""
+        # 图片数据是载荷中最后一个字符串字段，从右侧切分即可避开提示词中的同名字符
+        head, _, tail = _dumps(payload).rpartition(_IMAGE_PLACEHOLDER_JSON)
+        return b"".join((head, image_base64, tail))
+
+
+class VibeProxyClient(_VibeProxyBase):
+    """VibeProxy Gemini3Flash 客户端封装"""
+    
+    def __init__(self, use_cache: bool = True):
+        super().__init__(use_cache)
+        self.session = self._create_session()
+    
+    def _create_session(self) -> requests.Session:
+        # 复用同一个 Session：保持长连接，避免每次请求重新握手
+        session = requests.Session()
+        session.headers.update({"Content-Type": "application/json"})
+        # 速率限制与服务端错误交给 urllib3 重试：指数退避，并遵循 Retry-After 响应头
+        retry = _JitteredRetry(
+            total=self.max_retries,
+            backoff_factor=1,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["POST"],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = _KeepAliveAdapter(pool_connections=16, pool_maxsize=max(32, CONCURRENCY), max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._adapter = adapter
+        self._warm_up(adapter)
+        return session
+    
+    def _warm_up(self, adapter: HTTPAdapter) -> None:
+        """预先建立一条连接放回连接池，首个请求无需再等待 DNS 解析与握手；服务未启动时静默跳过"""
+        try:
+            pool = adapter.poolmanager.connection_from_url(self.base_url)
+            pool.urlopen("HEAD", "/", retries=False, timeout=2)
+        except Exception:
+            pass
+    
+    def close(self) -> None:
+        """释放连接池中的连接"""
+        self.session.close()
+    
+    def __enter__(self) -> "VibeProxyClient":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def _extract_with_cache(self, data: bytes, mime_type: str, prompt: str) -> Optional[str]:
+        """命中缓存时直接返回，否则请求模型并缓存成功结果"""
+        text, cache_path, image_hash = self._cache_lookup(data, prompt)
+        if text is not None:
+            return text
+        text = self._extract_text(base64.b64encode(data), mime_type, prompt)
+        if text:
+            self._cache_store(cache_path, image_hash, prompt, text)
+        return text
+    
+    def _post_json(self, url: str, body: bytes, extract: Callable[[Dict[str, Any]], Optional[str]],
+                   text_path: str) -> Optional[str]:
+        """发送JSON请求并提取生成的文本；重试由连接池适配器完成，最终失败时抛出异常"""
+        if ijson is not None:
+            with self.session.post(url, data=body, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                # 由 urllib3 负责解压，ijson 读到的始终是原始JSON
+                response.raw.decode_content = True
+                text = next(ijson.items(response.raw, text_path), None)
+                # 丢弃剩余内容，连接才能放回连接池复用
+                response.raw.drain_conn()
+                return text
+        response = self.session.post(url, data=body, timeout=self.timeout)
+        response.raise_for_status()
+        if orjson is not None:
+            return extract(orjson.loads(response.content))
+        return extract(response.json())
     
     def extract_text_from_image(self, image_path: str, prompt: str) -> Optional[str]:
         """
@@ -123,84 +483,222 @@ class VibeProxyClient:
             提取的文字内容，如果失败返回None
         """
         try:
-            # 编码图片
-            image_base64 = self._encode_image(image_path)
-            mime_type = self._get_mime_type(image_path)
+            data = self._read_image(image_path)
+            return self._extract_with_cache(data, self._sniff_mime_type(data), prompt)
             
-            # 构造请求载荷
-            gemini_payload = {
-                "contents": [{
-                    "parts": [
-                        {"text": prompt},
-                        {
-                            "inline_data": {
-                                "mime_type": mime_type,
-                                "data": image_base64
-                            }
-                        }
-                    ]
-                }],
-                "generation_config": {
-                    "temperature": 0.1,  # 低温度确保准确性
-                    "max_output_tokens": 2048
-                }
-            }
-            openai_payload = {
-                "model": self.model_name,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "temperature": 0.1,
-                "max_tokens": 2048
-            }
+        except Exception:
+            logger.exception("处理图片 %s 时发生错误", image_path)
+            return None
+    
+    def extract_text_from_image_bytes(self, data: bytes, mime_type: str, prompt: str) -> Optional[str]:
+        """
+        从内存中的图片数据提取文字内容（无需落盘）
+        
+        Args:
+            data: 图片二进制数据
+            mime_type: 图片MIME类型，如 image/jpeg
+            prompt: 提示词
             
-            if ":8318" in self.base_url:
-                return self._make_request_openai(openai_payload) or self._make_request_gemini(gemini_payload)
-            return self._make_request_gemini(gemini_payload) or self._make_request_openai(openai_payload)
+        Returns:
+            提取的文字内容，如果失败返回None
+        """
+        try:
+            return self._extract_with_cache(data, mime_type, prompt)
             
-        except Exception as e:
-            print(f"处理图片 {image_path} 时发生错误: {e}")
+        except Exception:
+            logger.exception("处理图片数据时发生错误")
             return None
     
-    def test_connection(self) -> bool:
-        """测试VibeProxy连接"""
+    def extract_text_from_image_pil(self, image, prompt: str, quality: int = 95) -> Optional[str]:
+        """
+        从内存中的PIL图片对象提取文字内容，编码一次JPEG后直接发送
+        
+        Args:
+            image: PIL.Image 图片对象（RGB模式）
+            prompt: 提示词
+            quality: JPEG编码质量
+            
+        Returns:
+            提取的文字内容，如果失败返回None
+        """
         try:
-            if ":8318" in self.base_url:
-                test_payload = {
-                    "model": self.model_name,
-                    "messages": [{"role": "user", "content": "你好"}]
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=quality)
+        except Exception:
+            logger.exception("编码图片时发生错误")
+            return None
+        return self.extract_text_from_image_bytes(buffer.getvalue(), "image/jpeg", prompt)
+    
+    def extract_text_from_images(self, jobs: Iterable[str], prompt: str,
+                                 concurrency: int = CONCURRENCY) -> Dict[str, Optional[str]]:
+        """
+        并发提取多张图片的文字内容，共享同一个 Session 的连接池
+        
+        Args:
+            jobs: 图片文件路径序列
+            prompt: 提示词
+            concurrency: 最大并发请求数
+            
+        Returns:
+            以图片路径为键的结果字典，失败项的值为None
+        """
+        results: Dict[str, Optional[str]] = {}
+        job_iter = iter(jobs)
+        # 在途任务上限为并发数的两倍，避免一次性提交全部任务
+        max_pending = concurrency * 2
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = {}
+            
+            def submit_more() -> None:
+                while len(pending) < max_pending:
+                    path = next(job_iter, None)
+                    if path is None:
+                        return
+                    pending[executor.submit(self.extract_text_from_image, path, prompt)] = path
+            
+            submit_more()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+                submit_more()
+        
+        return results
+    
+    def extract_text_from_images_batched(self, paths: Iterable[str], prompt: str,
+                                         batch: int = 4) -> Dict[str, Optional[str]]:
+        """
+        将多张小图合并到一次请求中提取文字，按base64总大小分组；
+        某组请求失败或结果无法解析时，该组缺失的图片逐张重新提取
+        
+        Args:
+            paths: 图片文件路径序列
+            prompt: 提示词（单张图片的提取要求）
+            batch: 每次请求最多包含的图片数
+            
+        Returns:
+            以图片路径为键的结果字典，失败项的值为None
+        """
+        results: Dict[str, Optional[str]] = {}
+        group: List[Tuple[str, bytes, str, Optional[str], Any]] = []
+        group_bytes = 0
+        
+        for path in paths:
+            try:
+                data = self._read_image(path)
+            except OSError:
+                logger.exception("处理图片 %s 时发生错误", path)
+                results[path] = None
+                continue
+            text, cache_path, image_hash = self._cache_lookup(data, prompt)
+            if text is not None:
+                results[path] = text
+                continue
+            image_base64 = base64.b64encode(data)
+            if group and (len(group) >= batch or group_bytes + len(image_base64) > BATCH_MAX_BYTES):
+                self._extract_batch(group, prompt, results)
+                group, group_bytes = [], 0
+            group.append((path, image_base64, self._sniff_mime_type(data), cache_path, image_hash))
+            group_bytes += len(image_base64)
+        if group:
+            self._extract_batch(group, prompt, results)
+        
+        return results
+    
+    def _extract_batch(self, group: List[Tuple[str, bytes, str, Optional[str], Any]], prompt: str,
+                       results: Dict[str, Optional[str]]) -> None:
+        texts: Dict[int, str] = {}
+        if len(group) > 1:
+            batch_prompt = prompt + BATCH_PROMPT.format(count=len(group), last=len(group) - 1)
+            url, _, extract, text_path = self._primary
+            if self._prefers_openai:
+                payload = {
+                    **self._openai_tail,
+                    "max_tokens": self._openai_tail["max_tokens"] * len(group),
+                    "messages": [{
+                        "role": "user",
+                        "content": [{"type": "text", "text": batch_prompt}] + [
+                            {
+                                "type": "image_url",
+                                "image_url": {"url": f"data:{mime_type};base64,{image_base64.decode('ascii')}"}
+                            }
+                            for _, image_base64, mime_type, _, _ in group
+                        ]
+                    }]
                 }
-                response = requests.post(
-                    f"{self.base_url}/v1/chat/completions",
-                    headers={"Content-Type": "application/json"},
-                    json=test_payload,
-                    timeout=10
-                )
-                return response.status_code == 200
             else:
-                test_payload = {
+                payload = {
                     "contents": [{
-                        "parts": [{"text": "你好"}]
-                    }]
+                        "parts": [{"text": batch_prompt}] + [
+                            {"inline_data": {"mime_type": mime_type, "data": image_base64.decode('ascii')}}
+                            for _, image_base64, mime_type, _, _ in group
+                        ]
+                    }],
+                    "generation_config": {
+                        **self._gen_cfg,
+                        "max_output_tokens": self._gen_cfg["max_output_tokens"] * len(group)
+                    }
                 }
-                response = requests.post(
-                    f"{self.base_url}/v1/models/{self.model_name}:generateContent",
-                    headers={"Content-Type": "application/json"},
-                    json=test_payload,
-                    timeout=10
-                )
-                return response.status_code == 200
+            try:
+                text = self._post_json(url, _dumps(payload), extract, text_path)
+            except _RESPONSE_ERRORS as e:
+                _log_request_failure("多图请求失败，改为逐张提取", e)
+                text = None
+            if text:
+                texts = _parse_batch_texts(text, len(group))
+        
+        for index, (path, image_base64, mime_type, cache_path, image_hash) in enumerate(group):
+            text = texts.get(index)
+            if text is None:
+                text = self._extract_text(image_base64, mime_type, prompt)
+                # 只缓存单图请求的结果：多图回复是在另一份提示词下得到的，不能记在单图提示词的键下
+                if text:
+                    self._cache_store(cache_path, image_hash, prompt, text)
+            results[path] = text
+    
+    def _extract_text(self, image_base64: bytes, mime_type: str, prompt: str) -> Optional[str]:
+        """按端点类型构造载荷并发送请求"""
+        # 载荷内嵌整张图片的base64，只在真正发送时才构造，备用端点的载荷多数情况下不必生成
+        for url, build_payload, extract, text_path in (self._primary, self._secondary):
+            try:
+                body = self._encode_body(build_payload(mime_type, prompt), image_base64)
+                text = self._post_json(url, body, extract, text_path)
+            except _RESPONSE_ERRORS as e:
+                _log_request_failure("API请求失败", e)
+                continue
+            if text:
+                return text
+        logger.error("主备端点均未返回结果，放弃本次提取")
+        return None
+    
+    def _probe(self, method: str, url: str, body: Optional[bytes] = None, timeout: float = 3) -> int:
+        """直接经连接池发送探测请求并返回状态码；不经过适配器的重试，服务未启动时立即失败"""
+        response = self._adapter.poolmanager.urlopen(
+            method, url, body=body, headers=self.session.headers,
+            retries=False, redirect=False, timeout=timeout
+        )
+        return response.status
+    
+    def _probe_generate(self) -> bool:
+        """发送一次完整的生成请求确认模型可用"""
+        url, test_payload = self._probe_request()
+        return self._probe("POST", url, _dumps(test_payload), timeout=10) == 200
+    
+    def test_connection(self) -> bool:
+        """测试VibeProxy连接，成功结果在一段时间内复用"""
+        if self._connection_cached():
+            return True
+        now = time.monotonic()
+        try:
+            # 先用 HEAD 探测服务是否在线，不消耗模型额度；无法判断时再发送完整的生成请求
+            status = self._probe("HEAD", f"{self.base_url}/v1/models/{self.model_name}")
+            ok = status < 500 and status != 405
+            if not ok:
+                ok = self._probe_generate()
         except Exception as e:
-            print(f"连接测试失败: {e}")
+            logger.warning("连接测试失败: %s", e)
             return False
+        if ok:
+            self._connected_at = now
+        return ok